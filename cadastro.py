@@ -1,26 +1,43 @@
 import cv2
 import face_recognition
-import numpy as np
 import os
 import pickle
 from pathlib import Path
 import argparse
 import time
 
+from eventos import RecognitionEventLog
+from galeria_distribuida import ShardedGallery
+from lote_encodings import EncodingBatcher
+
 class FaceRecognitionSystem:
-    def __init__(self, cadastro_dir="cadastro", encodings_file="face_encodings.pkl"):
+    def __init__(self, cadastro_dir="cadastro", encodings_file="face_encodings.pkl",
+                 batch_size=32, num_shards=1, gallery_dtype="float64"):
         """
         Inicializa o sistema de reconhecimento facial.
         
         Args:
             cadastro_dir (str): Diretório contendo as imagens de cadastro
             encodings_file (str): Arquivo para salvar/carregar encodings faciais
+            batch_size (int): Rostos por chamada ao encoder
+            num_shards (int): Processos usados na busca da galeria de encodings
+            gallery_dtype (str): Tipo numérico da galeria ("float32" economiza
+                memória em cadastros muito grandes)
         """
         self.cadastro_dir = cadastro_dir
         self.encodings_file = encodings_file
         self.known_face_encodings = []
         self.known_face_names = []
         
+        # Encoder em lote: o cadastro agrupa várias imagens por chamada; imagem
+        # e vídeo enviam todos os rostos do frame em uma única chamada
+        self.batcher = EncodingBatcher(batch_size=batch_size)
+        
+        # Galeria de busca, reconstruída sob demanda quando o cadastro muda
+        self.num_shards = num_shards
+        self.gallery_dtype = gallery_dtype
+        self.gallery = None
+        
         # Criar diretório de cadastro se não existir
         os.makedirs(cadastro_dir, exist_ok=True)
         
@@ -31,6 +48,8 @@ class FaceRecognitionSystem:
         """
         Carrega encodings existentes ou cria novos a partir das imagens de cadastro.
         """
+        self.reset_gallery()
+        
         # Tentar carregar encodings salvos
         if os.path.exists(self.encodings_file):
             try:
@@ -61,25 +80,29 @@ class FaceRecognitionSystem:
                     # Carregar imagem
                     image = face_recognition.load_image_file(str(image_path))
                     
-                    # Encontrar encodings faciais
-                    encodings = face_recognition.face_encodings(image)
+                    # Encontrar rostos
+                    face_locations = face_recognition.face_locations(image)
                     
-                    if encodings:
-                        # Usar apenas o primeiro rosto encontrado
-                        encoding = encodings[0]
-                        
+                    if face_locations:
                         # Nome da pessoa (nome do arquivo sem extensão)
                         name = image_path.stem.replace('_', ' ').title()
                         
-                        self.known_face_encodings.append(encoding)
-                        self.known_face_names.append(name)
-                        
-                        print(f"✓ Processado: {name}")
+                        # Usar apenas o primeiro rosto encontrado; o encoding
+                        # é gerado quando o lote enche ou ao final do cadastro
+                        self._add_encoded(self.batcher.submit(name, image, face_locations[:1]))
                     else:
                         print(f"✗ Nenhum rosto encontrado em: {image_path.name}")
                         
                 except Exception as e:
                     print(f"✗ Erro ao processar {image_path.name}: {e}")
+                
+                # Rostos que o encoder não conseguiu processar, deste ou de outro arquivo do lote
+                self._report_encoding_errors()
+        
+        # Processar os rostos que ficaram no último lote
+        self._add_encoded(self.batcher.flush())
+        self._report_encoding_errors()
+        print(self.batcher.format_stats())
         
         # Salvar encodings
         if self.known_face_encodings:
@@ -88,6 +111,80 @@ class FaceRecognitionSystem:
         else:
             print("⚠ Nenhuma pessoa foi cadastrada. Adicione imagens ao diretório 'cadastro'.")
     
+    def _add_encoded(self, results):
+        """
+        Adiciona ao cadastro os resultados devolvidos pelo encoder em lote.
+        
+        Args:
+            results (list): Tuplas (nome, location, encoding)
+        """
+        for name, _, encoding in results:
+            self.known_face_encodings.append(encoding)
+            self.known_face_names.append(name)
+            self.reset_gallery()
+            print(f"✓ Processado: {name}")
+    
+    def reset_gallery(self):
+        """
+        Descarta a galeria de busca para que seja reconstruída com o cadastro atual.
+        """
+        if self.gallery is not None:
+            self.gallery.close()
+            self.gallery = None
+    
+    def search_gallery(self, face_encodings, k=1):
+        """
+        Busca os k rostos cadastrados mais próximos de cada encoding.
+        
+        Args:
+            face_encodings (list): Encodings dos rostos detectados
+            k (int): Quantidade de candidatos por rosto
+            
+        Returns:
+            list: Para cada encoding, lista de (nome, distância) em ordem crescente
+        """
+        if self.gallery is None:
+            self.gallery = ShardedGallery(self.known_face_encodings, num_shards=self.num_shards,
+                                          dtype=self.gallery_dtype)
+        
+        distances, indices = self.gallery.search(face_encodings, k=k)
+        return [[(self.known_face_names[i], float(d)) for d, i in zip(row_d, row_i)]
+                for row_d, row_i in zip(distances, indices)]
+    
+    def match_faces(self, face_encodings, tolerance=0.6):
+        """
+        Identifica cada encoding pelo rosto cadastrado mais próximo.
+        
+        Args:
+            face_encodings (list): Encodings dos rostos detectados
+            tolerance (float): Distância máxima para considerar um rosto conhecido
+            
+        Returns:
+            list: Tuplas (nome, distância); nome é "Desconhecido" sem correspondência
+        """
+        matches = []
+        for candidates in self.search_gallery(face_encodings, k=1):
+            # Mesmo critério de face_recognition.compare_faces (distância <= tolerância)
+            if candidates and candidates[0][1] <= tolerance:
+                matches.append(candidates[0])
+            else:
+                matches.append(("Desconhecido", candidates[0][1] if candidates else None))
+        return matches
+    
+    def close(self):
+        """
+        Libera os processos e a memória compartilhada da galeria.
+        """
+        self.reset_gallery()
+    
+    def _report_encoding_errors(self):
+        """
+        Informa as pessoas cujos encodings foram perdidos por falha do encoder.
+        """
+        for error in self.batcher.take_errors():
+            names = ", ".join(str(name) for name, _ in error.lost)
+            print(f"✗ Erro ao gerar encodings de: {names} ({error.cause})")
+    
     def save_encodings(self):
         """
         Salva os encodings faciais em arquivo.
@@ -120,29 +217,18 @@ class FaceRecognitionSystem:
             
             # Encontrar localizações e encodings dos rostos
             face_locations = face_recognition.face_locations(rgb_image)
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+            face_encodings = self.batcher.encode(rgb_image, face_locations)
             
             identified_faces = []
             
+            # Comparar todos os rostos com a galeria de uma só vez
+            matches = self.match_faces(face_encodings, tolerance=0.6)
+            
             # Processar cada rosto encontrado
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                # Comparar com rostos conhecidos
-                matches = face_recognition.compare_faces(
-                    self.known_face_encodings, face_encoding, tolerance=0.6
-                )
-                name = "Desconhecido"
-                
-                # Usar distâncias para encontrar a melhor correspondência
-                face_distances = face_recognition.face_distance(
-                    self.known_face_encodings, face_encoding
-                )
-                
-                if matches and len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index]:
-                        name = self.known_face_names[best_match_index]
-                        confidence = 1 - face_distances[best_match_index]
-                        print(f"✓ Identificado: {name} (Confiança: {confidence:.2f})")
+            for (top, right, bottom, left), (name, distance) in zip(face_locations, matches):
+                if name != "Desconhecido":
+                    confidence = 1 - distance
+                    print(f"✓ Identificado: {name} (Confiança: {confidence:.2f})")
                 
                 identified_faces.append(name)
                 
@@ -163,105 +249,130 @@ class FaceRecognitionSystem:
             print(f"Erro ao processar imagem: {e}")
             return []
     
-    def recognize_faces_video(self, source=0):
+    def detect_faces(self, frame, scale=0.25):
+        """
+        Localiza os rostos de um frame BGR reduzido para processamento mais rápido.
+        
+        Args:
+            frame (numpy.ndarray): Frame BGR capturado
+            scale (float): Fator de redução aplicado antes da detecção
+            
+        Returns:
+            tuple: (frame reduzido em RGB, localizações dos rostos nele)
+        """
+        small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        return rgb_small_frame, face_recognition.face_locations(rgb_small_frame)
+    
+    def process_frame(self, frame, scale=0.25):
+        """
+        Detecta, gera encodings e identifica os rostos de um frame, sem interface.
+        
+        Args:
+            frame (numpy.ndarray): Frame BGR capturado
+            scale (float): Fator de redução aplicado antes da detecção
+            
+        Returns:
+            tuple: (localizações no frame reduzido, lista de (nome, distância))
+        """
+        rgb_small_frame, face_locations = self.detect_faces(frame, scale)
+        face_encodings = self.batcher.encode(rgb_small_frame, face_locations)
+        return face_locations, self.match_faces(face_encodings, tolerance=0.6)
+    
+    def recognize_faces_video(self, source=0, event_log=None, display=True):
         """
         Reconhece rostos em tempo real usando webcam ou arquivo de vídeo.
         
         Args:
             source: 0 para webcam padrão ou caminho para arquivo de vídeo
+            event_log (RecognitionEventLog): Registro opcional de entradas e saídas
+            display (bool): Mostrar a janela com o vídeo; False processa a
+                fonte até o fim sem interface
         """
         # Inicializar captura de vídeo
         video_capture = cv2.VideoCapture(source)
         
-        if not video_capture.isOpened():
-            print("Erro: Não foi possível abrir a fonte de vídeo")
-            return
-        
-        print("✓ Iniciando reconhecimento facial em tempo real...")
-        print("Pressione 'q' para sair, 'r' para recarregar cadastro")
-        
-        # Variáveis para otimização
-        process_this_frame = True
-        fps_counter = 0
-        start_time = time.time()
-        
-        while True:
-            # Capturar frame
-            ret, frame = video_capture.read()
-            if not ret:
-                break
+        try:
+            if not video_capture.isOpened():
+                print("Erro: Não foi possível abrir a fonte de vídeo")
+                return
+            
+            print("✓ Iniciando reconhecimento facial em tempo real...")
+            if display:
+                print("Pressione 'q' para sair, 'r' para recarregar cadastro")
             
-            # Redimensionar frame para processamento mais rápido
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            # Variáveis para otimização
+            process_this_frame = True
+            fps_counter = 0
+            start_time = time.time()
             
-            # Processar apenas frames alternados para melhor performance
-            if process_this_frame:
-                # Encontrar rostos e encodings
-                face_locations = face_recognition.face_locations(rgb_small_frame)
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+            while True:
+                # Capturar frame
+                ret, frame = video_capture.read()
+                if not ret:
+                    break
                 
-                face_names = []
-                for face_encoding in face_encodings:
-                    # Comparar com faces conhecidas
-                    matches = face_recognition.compare_faces(
-                        self.known_face_encodings, face_encoding, tolerance=0.6
-                    )
-                    name = "Desconhecido"
+                # Processar apenas frames alternados para melhor performance
+                if process_this_frame:
+                    # Encontrar rostos e compará-los com faces conhecidas
+                    face_locations, face_matches = self.process_frame(frame)
+                    face_names = [name for name, _ in face_matches]
                     
-                    # Usar distâncias para melhor precisão
-                    if self.known_face_encodings:
-                        face_distances = face_recognition.face_distance(
-                            self.known_face_encodings, face_encoding
-                        )
-                        best_match_index = np.argmin(face_distances)
-                        if matches[best_match_index] and face_distances[best_match_index] < 0.6:
-                            name = self.known_face_names[best_match_index]
+                    # Registrar entradas e saídas das pessoas reconhecidas
+                    if event_log is not None:
+                        event_log.record(face_matches)
+                
+                process_this_frame = not process_this_frame
+                
+                if not display:
+                    continue
+                
+                # Desenhar resultados no frame original
+                for (top, right, bottom, left), name in zip(face_locations, face_names):
+                    # Escalar coordenadas de volta para o tamanho original
+                    top *= 4
+                    right *= 4
+                    bottom *= 4
+                    left *= 4
                     
-                    face_names.append(name)
-            
-            process_this_frame = not process_this_frame
-            
-            # Desenhar resultados no frame original
-            for (top, right, bottom, left), name in zip(face_locations, face_names):
-                # Escalar coordenadas de volta para o tamanho original
-                top *= 4
-                right *= 4
-                bottom *= 4
-                left *= 4
+                    # Cor do retângulo (verde para conhecido, vermelho para desconhecido)
+                    color = (0, 255, 0) if name != "Desconhecido" else (0, 0, 255)
+                    
+                    # Desenhar retângulo ao redor do rosto
+                    cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                    
+                    # Desenhar label com nome
+                    cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+                    font = cv2.FONT_HERSHEY_DUPLEX
+                    cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
                 
-                # Cor do retângulo (verde para conhecido, vermelho para desconhecido)
-                color = (0, 255, 0) if name != "Desconhecido" else (0, 0, 255)
+                # Calcular e mostrar FPS
+                fps_counter += 1
+                if fps_counter % 30 == 0:
+                    elapsed_time = time.time() - start_time
+                    fps = fps_counter / elapsed_time
+                    cv2.putText(frame, f'FPS: {fps:.1f}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
                 
-                # Desenhar retângulo ao redor do rosto
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                # Mostrar frame
+                cv2.imshow('Reconhecimento Facial - Pressione "q" para sair', frame)
                 
-                # Desenhar label com nome
-                cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-                font = cv2.FONT_HERSHEY_DUPLEX
-                cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
-            
-            # Calcular e mostrar FPS
-            fps_counter += 1
-            if fps_counter % 30 == 0:
-                elapsed_time = time.time() - start_time
-                fps = fps_counter / elapsed_time
-                cv2.putText(frame, f'FPS: {fps:.1f}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            
-            # Mostrar frame
-            cv2.imshow('Reconhecimento Facial - Pressione "q" para sair', frame)
-            
-            # Verificar teclas pressionadas
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                break
-            elif key == ord('r'):
-                print("Recarregando cadastro...")
-                self.load_or_create_encodings()
+                # Verificar teclas pressionadas
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('r'):
+                    print("Recarregando cadastro...")
+                    self.load_or_create_encodings()
+        finally:
+            # Limpar recursos mesmo com Ctrl+C, erro no laço ou fonte inválida
+            video_capture.release()
+            if display:
+                cv2.destroyAllWindows()
+            if event_log is not None:
+                event_log.close()
+                print(f"✓ {event_log.events} eventos gravados em {event_log.writer.path}")
         
-        # Limpar recursos
-        video_capture.release()
-        cv2.destroyAllWindows()
+        print(self.batcher.format_stats())
         print("✓ Sistema encerrado")
     
     def add_person(self, image_path, person_name):
@@ -275,7 +386,8 @@ class FaceRecognitionSystem:
         try:
             # Carregar e processar imagem
             image = face_recognition.load_image_file(image_path)
-            encodings = face_recognition.face_encodings(image)
+            face_locations = face_recognition.face_locations(image)
+            encodings = self.batcher.encode(image, face_locations[:1])
             
             if not encodings:
                 print("✗ Nenhum rosto encontrado na imagem")
@@ -284,6 +396,7 @@ class FaceRecognitionSystem:
             # Adicionar encoding e nome
             self.known_face_encodings.append(encodings[0])
             self.known_face_names.append(person_name)
+            self.reset_gallery()
             
             # Salvar encodings atualizados
             self.save_encodings()
@@ -307,6 +420,16 @@ def main():
                        help='Fonte de vídeo (0 para webcam) ou caminho da imagem')
     parser.add_argument('--cadastro', default='cadastro',
                        help='Diretório com imagens de cadastro')
+    parser.add_argument('--lote', type=int, default=32,
+                       help='Rostos por chamada ao encoder (padrão: 32)')
+    parser.add_argument('--shards', type=int, default=1,
+                       help='Processos usados na busca do cadastro (padrão: 1)')
+    parser.add_argument('--eventos',
+                       help='Arquivo para registrar entradas e saídas no modo vídeo (.jsonl ou .bin)')
+    parser.add_argument('--saida-apos', type=float, default=2.0,
+                       help='Segundos sem ver a pessoa para registrar a saída (padrão: 2.0)')
+    parser.add_argument('--min-quadros', type=int, default=2,
+                       help='Frames processados com a pessoa antes de registrar a entrada (padrão: 2)')
     
     args = parser.parse_args()
     
@@ -314,29 +437,40 @@ def main():
     print("🔍 Iniciando Sistema de Reconhecimento Facial")
     print("=" * 50)
     
-    face_system = FaceRecognitionSystem(cadastro_dir=args.cadastro)
+    face_system = FaceRecognitionSystem(cadastro_dir=args.cadastro,
+                                        batch_size=args.lote,
+                                        num_shards=args.shards)
     
-    if args.mode == 'setup':
-        # Modo setup - apenas criar encodings
-        print("Modo setup concluído!")
-        
-    elif args.mode == 'image':
-        # Modo imagem
-        if isinstance(args.source, str) and os.path.exists(args.source):
-            print(f"Processando imagem: {args.source}")
-            identified = face_system.recognize_face_in_image(args.source)
-            print(f"Pessoas identificadas: {identified}")
-        else:
-            print("✗ Arquivo de imagem não encontrado")
-            
-    else:
-        # Modo vídeo (padrão)
-        try:
-            source = int(args.source) if args.source.isdigit() else args.source
-        except:
-            source = args.source
+    try:
+        if args.mode == 'setup':
+            # Modo setup - apenas criar encodings
+            print("Modo setup concluído!")
             
-        face_system.recognize_faces_video(source)
+        elif args.mode == 'image':
+            # Modo imagem
+            if isinstance(args.source, str) and os.path.exists(args.source):
+                print(f"Processando imagem: {args.source}")
+                identified = face_system.recognize_face_in_image(args.source)
+                print(f"Pessoas identificadas: {identified}")
+            else:
+                print("✗ Arquivo de imagem não encontrado")
+                
+        else:
+            # Modo vídeo (padrão)
+            try:
+                source = int(args.source) if args.source.isdigit() else args.source
+            except:
+                source = args.source
+                
+            event_log = None
+            if args.eventos:
+                event_log = RecognitionEventLog(args.eventos, leave_after=args.saida_apos,
+                                                min_hits=args.min_quadros)
+                
+            face_system.recognize_faces_video(source, event_log=event_log)
+    finally:
+        # Encerrar processos da galeria distribuída mesmo com Ctrl+C ou erro
+        face_system.close()
 
 
 if __name__ == "__main__":
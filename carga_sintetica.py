@@ -0,0 +1,706 @@
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+from multiprocessing.connection import wait
+from pathlib import Path
+
+import cv2
+import face_recognition
+import numpy as np
+
+from cadastro import FaceRecognitionSystem
+from lote_encodings import EncodingBatcher
+
+# Extensões de imagem usadas como fonte dos rostos sintéticos
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
+
+# Modos de execução:
+#   producao - process_frame em frames alternados, como recognize_faces_video
+#   arquivo  - recognize_faces_video(display=False) lendo o vídeo gravado
+#   lote     - experimental: rostos de todos os streams no mesmo lote do encoder
+# Em producao e arquivo cada stream roda em um processo próprio; em lote todos
+# os streams compartilham um processo.
+MODES = ('producao', 'arquivo', 'lote')
+
+
+def process_memory_mb(pid=None):
+    """
+    Retorna a memória exclusiva (USS) de um processo em MB, se disponível.
+
+    Páginas herdadas no fork e a galeria em memória compartilhada não entram,
+    então a soma entre processos não conta nada duas vezes.
+
+    Args:
+        pid (int): Processo medido (padrão: o atual)
+    """
+    try:
+        import psutil
+        return psutil.Process(pid).memory_full_info().uss / 2**20
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    # Sem psutil: páginas privadas de /proc (somente Linux)
+    try:
+        private = 0
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    private += int(line.split()[1])
+        return private / 1024
+    except (OSError, ValueError):
+        return None
+
+
+class MemorySampler:
+    def __init__(self, gallery=None, interval=0.1):
+        """
+        Mede, em segundo plano, o pico de memória do processo atual somado ao
+        dos trabalhadores da galeria distribuída.
+
+        O total de cada amostra é a USS deste processo, mais a USS de cada
+        trabalhador, mais o bloco de memória compartilhada contado uma vez.
+
+        Args:
+            gallery (ShardedGallery): Galeria cujos trabalhadores são medidos
+            interval (float): Intervalo entre amostras, em segundos
+        """
+        self.gallery = gallery
+        self.interval = interval
+        self.peak_mb = None
+        self.worker_peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """
+        Registra uma amostra e atualiza os picos.
+        """
+        own = process_memory_mb()
+        if own is None:
+            return
+
+        workers = 0.0
+        pids = self.gallery.worker_pids() if self.gallery is not None else []
+        for pid in pids:
+            workers += process_memory_mb(pid) or 0.0
+        shared = self.gallery.shared_bytes / 2**20 if self.gallery is not None else 0.0
+
+        self.worker_peak_mb = max(self.worker_peak_mb, workers)
+        self.peak_mb = max(self.peak_mb or 0.0, own + workers + shared)
+
+
+def load_face_crops(paths, margin=0.6, max_side=800):
+    """
+    Carrega as imagens e recorta a região do rosto de cada uma.
+
+    Args:
+        paths (list): Caminhos das imagens
+        margin (float): Margem ao redor do rosto, proporcional ao tamanho dele
+        max_side (int): Lado máximo usado na detecção (imagens maiores são reduzidas)
+
+    Returns:
+        list: Recortes BGR (numpy.ndarray); imagens sem rosto usam o centro
+    """
+    crops = []
+    for path in paths:
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"✗ Não foi possível ler: {path}")
+            continue
+
+        ratio = min(1.0, max_side / max(image.shape[:2]))
+        small = cv2.resize(image, (0, 0), fx=ratio, fy=ratio)
+        locations = face_recognition.face_locations(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+
+        height, width = image.shape[:2]
+        if locations:
+            top, right, bottom, left = [int(v / ratio) for v in locations[0]]
+        else:
+            side = min(height, width) // 2
+            top, left = (height - side) // 2, (width - side) // 2
+            bottom, right = top + side, left + side
+
+        # Recorte quadrado centrado no rosto
+        side = int(max(bottom - top, right - left) * (1 + margin))
+        center_y, center_x = (top + bottom) // 2, (left + right) // 2
+        y0, x0 = max(0, center_y - side // 2), max(0, center_x - side // 2)
+        crops.append(image[y0:min(height, y0 + side), x0:min(width, x0 + side)].copy())
+
+    return crops
+
+
+def perturb_face(face, rng):
+    """
+    Aplica rotação, escala, espelhamento, brilho, contraste e ruído aleatórios.
+    """
+    height, width = face.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2),
+                                     rng.uniform(-10, 10), rng.uniform(0.9, 1.1))
+    face = cv2.warpAffine(face, matrix, (width, height), borderMode=cv2.BORDER_REFLECT)
+    if rng.random() < 0.5:
+        face = cv2.flip(face, 1)
+    face = cv2.convertScaleAbs(face, alpha=rng.uniform(0.8, 1.2), beta=rng.uniform(-25, 25))
+    noise = rng.normal(0, 4, face.shape)
+    return np.clip(face + noise, 0, 255).astype(np.uint8)
+
+
+def synthesize_frame(faces, faces_per_frame, cell_size, rng):
+    """
+    Monta um frame em grade com rostos perturbados.
+
+    Args:
+        faces (list): Recortes de rosto usados como base
+        faces_per_frame (int): Quantidade de rostos no frame
+        cell_size (int): Lado, em pixels, de cada célula da grade
+        rng (numpy.random.Generator): Gerador de números aleatórios
+
+    Returns:
+        numpy.ndarray: Frame BGR
+    """
+    cols = math.ceil(math.sqrt(faces_per_frame))
+    rows = math.ceil(faces_per_frame / cols)
+    frame = rng.integers(20, 60, (rows * cell_size, cols * cell_size, 3), dtype=np.uint8)
+
+    for i in range(faces_per_frame):
+        row, col = divmod(i, cols)
+        face = cv2.resize(faces[rng.integers(len(faces))], (cell_size, cell_size))
+        frame[row * cell_size:(row + 1) * cell_size,
+              col * cell_size:(col + 1) * cell_size] = perturb_face(face, rng)
+
+    return frame
+
+
+def write_video(path, frames, fps=15):
+    """
+    Grava os frames em um arquivo de vídeo com cv2.VideoWriter.
+    """
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def frame_source(frames, offset=0):
+    """
+    Fonte infinita que percorre frames já sintetizados em memória.
+    """
+    i = offset
+    while True:
+        yield frames[i % len(frames)]
+        i += 1
+
+
+def video_file_source(path):
+    """
+    Fonte infinita que lê um arquivo de vídeo e volta ao início no fim.
+    """
+    capture = cv2.VideoCapture(str(path))
+    try:
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = capture.read()
+                if not ret:
+                    return
+            yield frame
+    finally:
+        capture.release()
+
+
+def set_random_gallery(face_system, base_encodings, base_names, size, rng):
+    """
+    Completa o cadastro com encodings aleatórios até atingir size entradas.
+
+    Os encodings sintéticos seguem a escala dos encodings do dlib (norma
+    próxima de 1), longe o bastante entre si para não gerar falsos positivos.
+    A galeria fica como em produção: uma lista com um array float64 por
+    pessoa, convertida para face_system.gallery_dtype ao montar a busca.
+    """
+    extra = max(0, size - len(base_encodings))
+    synthetic = [rng.normal(0, 0.09, 128) for _ in range(extra)]
+
+    face_system.known_face_encodings = list(base_encodings) + synthetic
+    face_system.known_face_names = list(base_names) + [f"Sintetico {i}" for i in range(extra)]
+    face_system.reset_gallery()
+
+
+def drive_production(face_system, sources, frames_per_stream):
+    """
+    Processa as fontes em rodízio pelo mesmo caminho de recognize_faces_video.
+
+    Cada stream chama process_frame em frames alternados, como o laço de
+    vídeo; os frames pulados contam na vazão, mas não na latência.
+
+    Args:
+        face_system (FaceRecognitionSystem): Sistema já com o cadastro desejado
+        sources (list): Iteradores de frames BGR, um por stream
+        frames_per_stream (int): Frames lidos de cada fonte
+
+    Returns:
+        dict: Latências por frame processado (s), frames lidos, total de
+        rostos, rostos reconhecidos e tempo total
+    """
+    latencies = []
+    totals = {'faces': 0, 'known': 0}
+    process_this_frame = [True] * len(sources)
+
+    start = time.perf_counter()
+    for _ in range(frames_per_stream):
+        for stream, source in enumerate(sources):
+            frame = next(source)
+            process = process_this_frame[stream]
+            process_this_frame[stream] = not process
+            if not process:
+                continue
+
+            frame_start = time.perf_counter()
+            _, face_matches = face_system.process_frame(frame)
+            latencies.append(time.perf_counter() - frame_start)
+            totals['faces'] += len(face_matches)
+            totals['known'] += sum(name != "Desconhecido" for name, _ in face_matches)
+
+    return {'latencies': latencies, 'elapsed': time.perf_counter() - start,
+            'frames': frames_per_stream * len(sources), **totals}
+
+
+def drive_video_files(face_system, paths):
+    """
+    Executa recognize_faces_video(display=False) em cada arquivo, um após o outro.
+
+    A latência vem de process_frame, medido dentro do próprio laço de vídeo.
+
+    Args:
+        face_system (FaceRecognitionSystem): Sistema já com o cadastro desejado
+        paths (list): Arquivos de vídeo, um por stream
+
+    Returns:
+        dict: Mesmas métricas de drive_production
+    """
+    latencies = []
+    totals = {'faces': 0, 'known': 0, 'frames': 0}
+    process_frame = face_system.process_frame
+
+    def timed_process_frame(frame, scale=0.25):
+        frame_start = time.perf_counter()
+        face_locations, face_matches = process_frame(frame, scale)
+        latencies.append(time.perf_counter() - frame_start)
+        totals['faces'] += len(face_matches)
+        totals['known'] += sum(name != "Desconhecido" for name, _ in face_matches)
+        return face_locations, face_matches
+
+    for path in paths:
+        capture = cv2.VideoCapture(str(path))
+        totals['frames'] += int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+
+    face_system.process_frame = timed_process_frame
+    try:
+        start = time.perf_counter()
+        for path in paths:
+            face_system.recognize_faces_video(str(path), display=False)
+        elapsed = time.perf_counter() - start
+    finally:
+        del face_system.process_frame
+
+    return {'latencies': latencies, 'elapsed': elapsed, **totals}
+
+
+def drive_streams(face_system, sources, frames_per_stream, scale=0.25):
+    """
+    Processa as fontes em rodízio, agrupando os rostos de todas no mesmo lote.
+
+    Modo experimental: o laço de vídeo de produção não agrupa rostos de
+    streams diferentes, então estes números não descrevem cadastro.py.
+
+    Args:
+        face_system (FaceRecognitionSystem): Sistema já com o cadastro desejado
+        sources (list): Iteradores de frames BGR, um por stream
+        frames_per_stream (int): Frames processados de cada fonte
+        scale (float): Fator de redução aplicado antes da detecção
+
+    Returns:
+        dict: Latências por frame (s), total de rostos, rostos reconhecidos e tempo total
+    """
+    batcher = face_system.batcher
+    pending = {}
+    latencies = []
+    totals = {'faces': 0, 'known': 0}
+
+    def complete(results):
+        if not results:
+            return
+        matches = face_system.match_faces([encoding for _, _, encoding in results])
+        now = time.perf_counter()
+        for (key, _, _), (name, _) in zip(results, matches):
+            entry = pending[key]
+            entry[1] -= 1
+            totals['known'] += name != "Desconhecido"
+            if entry[1] == 0:
+                latencies.append(now - entry[0])
+                del pending[key]
+
+    start = time.perf_counter()
+    for step in range(frames_per_stream):
+        for stream, source in enumerate(sources):
+            frame = next(source)
+            frame_start = time.perf_counter()
+            rgb_small_frame, face_locations = face_system.detect_faces(frame, scale)
+            totals['faces'] += len(face_locations)
+
+            if not face_locations:
+                latencies.append(time.perf_counter() - frame_start)
+                continue
+
+            pending[(stream, step)] = [frame_start, len(face_locations)]
+            complete(batcher.submit((stream, step), rgb_small_frame, face_locations))
+        complete(batcher.poll())
+    complete(batcher.flush())
+
+    return {'latencies': latencies, 'elapsed': time.perf_counter() - start,
+            'frames': frames_per_stream * len(sources), **totals}
+
+
+def synthesize_pool(faces, faces_per_frame, cell_size, seed, variations=8):
+    """
+    Gera os frames sintéticos de um cenário, iguais em todos os processos.
+    """
+    rng = np.random.default_rng(seed)
+    return [synthesize_frame(faces, faces_per_frame, cell_size, rng) for _ in range(variations)]
+
+
+def run_scenario(face_system, pool, base_encodings, base_names, gallery_size, streams,
+                 frames, seed, mode='producao', max_wait=0.05, first_stream=0,
+                 video_path=None, barrier=None):
+    """
+    Executa os streams de um processo e retorna as medições brutas dele.
+
+    Args:
+        pool (list): Frames sintéticos gerados antes da medição (synthesize_pool)
+        streams (int): Streams processados neste processo
+        mode (str): Um dos MODES
+        max_wait (float): Espera máxima do lote; só tem efeito no modo 'lote'
+        first_stream (int): Índice global do primeiro stream deste processo,
+            usado para defasar os frames entre streams
+        video_path (str): Vídeo gravado; obrigatório no modo 'arquivo'
+        barrier (multiprocessing.Barrier): Sincroniza o início da medição
+            entre os processos do cenário
+
+    Returns:
+        dict: Início e fim da medição (time.time), latências por frame
+        processado (ms), frames, rostos, rostos reconhecidos, estatísticas do
+        lote e memória
+    """
+    if mode not in MODES:
+        raise ValueError(f"Modo inválido: {mode}")
+
+    # Mesma semente em todos os processos: todos buscam na mesma galeria
+    rng = np.random.default_rng(seed + 1)
+    set_random_gallery(face_system, base_encodings, base_names, gallery_size, rng)
+
+    face_system.batcher = EncodingBatcher(batch_size=face_system.batcher.batch_size,
+                                          max_wait=max_wait)
+    # Primeira busca fora da medição: monta a galeria e os processos dos shards
+    face_system.search_gallery(np.zeros((1, 128)))
+
+    if barrier is not None:
+        barrier.wait()
+
+    # Memória amostrada enquanto os trabalhadores dos shards estão vivos
+    with MemorySampler(face_system.gallery) as memory:
+        started = time.time()
+        if mode == 'arquivo':
+            result = drive_video_files(face_system, [video_path] * streams)
+        else:
+            if video_path is not None:
+                sources = [video_file_source(video_path) for _ in range(streams)]
+            else:
+                sources = [frame_source(pool, offset=first_stream + i) for i in range(streams)]
+            drive = drive_production if mode == 'producao' else drive_streams
+            result = drive(face_system, sources, frames)
+        finished = time.time()
+
+    stats = face_system.batcher.stats()
+    return {
+        'started': started,
+        'finished': finished,
+        'latencies_ms': [latency * 1000 for latency in result['latencies']],
+        'frames': result['frames'],
+        'faces': result['faces'],
+        'known': result['known'],
+        'batches': stats['batches'],
+        'encoded': stats['faces'],
+        'memory_mb': memory.peak_mb,
+        'worker_memory_mb': memory.worker_peak_mb,
+        'shared_memory_mb': face_system.gallery.shared_bytes / 2**20,
+    }
+
+
+def aggregate_results(parts, scenario, mode, batch_size, gallery_dtype):
+    """
+    Junta as medições dos processos de um cenário.
+
+    A vazão divide o total de frames pelo intervalo entre o primeiro início
+    e o último fim; as latências de todos os streams formam uma única
+    distribuição; a memória é a soma dos picos de cada processo.
+    """
+    faces_per_frame, gallery_size, streams = scenario
+    elapsed = max(p['finished'] for p in parts) - min(p['started'] for p in parts)
+    latencies_ms = np.array([l for p in parts for l in p['latencies_ms']] or [0.0])
+    frames = sum(p['frames'] for p in parts)
+    faces = sum(p['faces'] for p in parts)
+    known = sum(p['known'] for p in parts)
+    batches = sum(p['batches'] for p in parts)
+    memory = [p['memory_mb'] for p in parts]
+
+    return {
+        'mode': mode,
+        'gallery_dtype': str(np.dtype(gallery_dtype)),
+        'faces_per_frame': faces_per_frame,
+        'gallery_size': gallery_size,
+        'streams': streams,
+        'processes': len(parts),
+        'frames': frames,
+        'processed_frames': sum(len(p['latencies_ms']) for p in parts),
+        'faces': faces,
+        'recognized': known / faces if faces else 0.0,
+        'frames_per_s': frames / elapsed,
+        'faces_per_s': faces / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'fill_rate': (sum(p['encoded'] for p in parts) / (batches * batch_size)
+                      if batches else 0.0),
+        'memory_mb': sum(memory) if None not in memory else None,
+        'worker_memory_mb': sum(p['worker_memory_mb'] for p in parts),
+        'shared_memory_mb': sum(p['shared_memory_mb'] for p in parts),
+    }
+
+
+def _stream_process(conn, barrier, options, faces, scenario, mode, first_stream, streams,
+                    video_path):
+    """
+    Executa streams de um cenário em um processo próprio e envia as medições pelo conn.
+
+    Cada processo tem o seu FaceRecognitionSystem, como uma instância de
+    cadastro.py por câmera, e não herda galerias de cenários anteriores.
+    """
+    try:
+        pool = synthesize_pool(faces, scenario[0], options['celula'], options['seed'])
+        face_system = FaceRecognitionSystem(cadastro_dir=options['cadastro'],
+                                            batch_size=options['lote'],
+                                            num_shards=options['shards'],
+                                            gallery_dtype=options['tipo_galeria'])
+        base_encodings = list(face_system.known_face_encodings)
+        base_names = list(face_system.known_face_names)
+        try:
+            result = run_scenario(face_system, pool, base_encodings, base_names, scenario[1],
+                                  streams, options['frames'], options['seed'], mode=mode,
+                                  max_wait=options['espera_lote'], first_stream=first_stream,
+                                  video_path=video_path, barrier=barrier)
+        finally:
+            face_system.close()
+        conn.send(result)
+    except threading.BrokenBarrierError:
+        conn.send({'error': "cenário interrompido pela falha de outro stream"})
+    except Exception as e:
+        # Liberar os demais processos que esperam na barreira
+        barrier.abort()
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_scenario_concurrent(options, faces, scenario, mode):
+    """
+    Executa um cenário com um processo por stream e retorna as métricas agregadas.
+
+    Nos modos 'producao' e 'arquivo' cada stream roda em paralelo no seu
+    processo; no modo 'lote' todos os streams ficam em um único processo,
+    pois compartilham o mesmo lote do encoder.
+
+    Returns:
+        dict: Métricas do cenário, ou {'error': mensagem} se ele falhar
+    """
+    faces_per_frame, gallery_size, streams = scenario
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = None
+        if options['gravar_video'] or mode == 'arquivo':
+            pool = synthesize_pool(faces, faces_per_frame, options['celula'], options['seed'])
+            video_dir = options['gravar_video'] or temp_dir
+            os.makedirs(video_dir, exist_ok=True)
+            # Sempre regravar: semente, célula e imagens de origem mudam o conteúdo
+            video_path = str(Path(video_dir) / f"sintetico_{faces_per_frame}_rostos.mp4")
+            write_video(video_path, [pool[i % len(pool)] for i in range(options['frames'])])
+
+        # (primeiro stream, quantidade de streams) de cada processo
+        if mode == 'lote':
+            assignments = [(0, streams)]
+        else:
+            assignments = [(stream, 1) for stream in range(streams)]
+
+        context = mp.get_context('spawn')
+        barrier = context.Barrier(len(assignments))
+        receivers = {}
+        processes = []
+        for first_stream, count in assignments:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_stream_process,
+                                      args=(sender, barrier, options, faces, scenario, mode,
+                                            first_stream, count, video_path))
+            process.start()
+            sender.close()
+            receivers[receiver] = process
+            processes.append(process)
+
+        parts = []
+        errors = []
+        try:
+            while receivers:
+                for receiver in wait(list(receivers)):
+                    process = receivers.pop(receiver)
+                    try:
+                        result = receiver.recv()
+                    except EOFError:
+                        process.join()
+                        result = {'error': f"processo encerrado com código {process.exitcode}"}
+                    if 'error' in result:
+                        errors.append(result['error'])
+                        barrier.abort()
+                    else:
+                        parts.append(result)
+        finally:
+            for process in processes:
+                process.join()
+
+    if errors:
+        # A primeira falha é a causa; as demais são processos interrompidos
+        return {'error': errors[0]}
+    return aggregate_results(parts, scenario, mode, options['lote'], options['tipo_galeria'])
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    """
+    Mede a vazão, latência e memória do pipeline de vídeo conforme a carga cresce.
+    """
+    parser = argparse.ArgumentParser(description='Teste de carga com vídeo sintético')
+    parser.add_argument('--cadastro', default='cadastro',
+                       help='Diretório com imagens de cadastro')
+    parser.add_argument('--imagens', nargs='*', default=['gerdeson_silva.JPEG'],
+                       help='Imagens extras usadas como rostos (padrão: gerdeson_silva.JPEG)')
+    parser.add_argument('--rostos', type=_int_list, default=[1, 10, 50],
+                       help='Rostos por frame, separados por vírgula (padrão: 1,10,50)')
+    parser.add_argument('--galeria', type=_int_list, default=[100, 100000, 1000000],
+                       help='Tamanhos de cadastro, separados por vírgula (padrão: 100,100000,1000000)')
+    parser.add_argument('--streams', type=_int_list, default=[1, 8, 32],
+                       help='Streams simultâneos, separados por vírgula (padrão: 1,8,32)')
+    parser.add_argument('--frames', type=int, default=20,
+                       help='Frames processados por stream em cada cenário (padrão: 20)')
+    parser.add_argument('--celula', type=int, default=320,
+                       help='Lado em pixels de cada rosto no frame (padrão: 320)')
+    parser.add_argument('--lote', type=int, default=32,
+                       help='Rostos por chamada ao encoder (padrão: 32)')
+    parser.add_argument('--espera-lote', type=float, default=0.05,
+                       help='Espera máxima em segundos para completar um lote no modo lote (padrão: 0.05)')
+    parser.add_argument('--shards', type=int, default=1,
+                       help='Processos usados na busca do cadastro (padrão: 1)')
+    parser.add_argument('--tipo-galeria', choices=['float64', 'float32'], default='float64',
+                       help='Tipo numérico da galeria de busca (padrão: float64, como em cadastro.py)')
+    parser.add_argument('--modos', type=lambda v: v.split(','), default=['producao'],
+                       help='Modos separados por vírgula: producao (process_frame em frames '
+                            'alternados, como o modo vídeo), arquivo (recognize_faces_video sem '
+                            'janela sobre o vídeo gravado) e lote (experimental: um lote do '
+                            'encoder para todos os streams) (padrão: producao)')
+    parser.add_argument('--gravar-video',
+                       help='Grava os frames sintéticos neste diretório e lê deles via cv2.VideoCapture')
+    parser.add_argument('--json', help='Arquivo para salvar os resultados')
+    parser.add_argument('--seed', type=int, default=0, help='Semente aleatória (padrão: 0)')
+
+    args = parser.parse_args()
+
+    invalid = [mode for mode in args.modos if mode not in MODES]
+    if invalid:
+        parser.error(f"modos inválidos: {', '.join(invalid)}")
+
+    print("🔍 Teste de carga do Sistema de Reconhecimento Facial")
+    print("=" * 50)
+    print(f"Galeria: lista de encodings float64, buscada como {args.tipo_galeria}")
+
+    # Criar o arquivo de encodings uma vez; cada cenário o carrega no próprio processo
+    FaceRecognitionSystem(cadastro_dir=args.cadastro).close()
+
+    paths = [p for p in Path(args.cadastro).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS]
+    paths += [Path(p) for p in args.imagens if os.path.exists(p)]
+    faces = load_face_crops(paths)
+    if not faces:
+        print("✗ Nenhuma imagem de rosto encontrada para gerar os frames")
+        return
+
+    # Cada dimensão varia sozinha; as demais ficam no primeiro valor da lista
+    baseline = (args.rostos[0], args.galeria[0], args.streams[0])
+    scenarios = [baseline]
+    for index, values in enumerate((args.rostos, args.galeria, args.streams)):
+        for value in values:
+            scenario = list(baseline)
+            scenario[index] = value
+            if tuple(scenario) not in scenarios:
+                scenarios.append(tuple(scenario))
+
+    print(f"{'modo':>8} {'rostos':>6} {'galeria':>9} {'streams':>7} {'frames/s':>9} {'rostos/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mem MB':>8} {'lote':>5} {'reconh.':>7}")
+
+    options = vars(args)
+    results = []
+    for mode in args.modos:
+        for scenario in scenarios:
+            faces_per_frame, gallery_size, streams = scenario
+            result = run_scenario_concurrent(options, faces, scenario, mode)
+            if 'error' in result:
+                print(f"✗ {mode} {faces_per_frame} rostos, galeria {gallery_size}, "
+                      f"{streams} streams: {result['error']}")
+                continue
+            results.append(result)
+            memory = (f"{result['memory_mb']:.0f}"
+                      if result['memory_mb'] is not None else "-")
+            print(f"{mode:>8} {faces_per_frame:>6} {gallery_size:>9} {streams:>7} "
+                  f"{result['frames_per_s']:>9.1f} {result['faces_per_s']:>9.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{memory:>8} {result['fill_rate']:>5.0%} {result['recognized']:>7.0%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
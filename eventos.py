@@ -0,0 +1,415 @@
+import argparse
+import bisect
+import json
+import math
+import os
+import struct
+import time
+from datetime import datetime
+
+# Registro binário: timestamp, visto em, tipo (0=entrada, 1=saída), distância, tamanho do nome
+_RECORD = struct.Struct('<ddBfH')
+# Entrada do índice: timestamp do registro e posição dele no arquivo de eventos
+_INDEX_ENTRY = struct.Struct('<dQ')
+
+EVENT_TYPES = ('enter', 'leave')
+
+
+def _detect_format(path, fmt):
+    if fmt is None:
+        fmt = 'bin' if path.endswith('.bin') else 'jsonl'
+    if fmt not in ('jsonl', 'bin'):
+        raise ValueError(f"Formato de eventos inválido: {fmt}")
+    return fmt
+
+
+class EventDebouncer:
+    def __init__(self, leave_after=2.0, min_hits=2, ignore=("Desconhecido",)):
+        """
+        Converte detecções por frame em eventos de entrada e saída.
+
+        Cada evento recebe o timestamp do frame em que foi decidido: a entrada
+        no frame em que a identidade atinge min_hits, a saída no primeiro
+        frame após leave_after segundos sem vê-la. Assim os eventos saem em
+        ordem cronológica, o que permite indexar o arquivo por tempo. O
+        momento real fica em seen_at: a primeira vez que a identidade foi
+        vista (entrada) ou a última (saída).
+
+        Args:
+            leave_after (float): Segundos sem ver uma identidade para gerar a saída
+            min_hits (int): Frames processados com a identidade antes da entrada;
+                acima de 1 evita que um único reconhecimento errado gere eventos
+            ignore (tuple): Identidades que não geram eventos
+        """
+        self.leave_after = leave_after
+        self.min_hits = min_hits
+        self.ignore = set(ignore)
+
+        # identidade -> [primeira vez vista, última vez vista, acertos, melhor distância, ativa]
+        self._tracks = {}
+        self._last_timestamp = None
+
+    def update(self, detections, timestamp=None):
+        """
+        Atualiza o estado com as detecções de um frame.
+
+        Args:
+            detections (list): Tuplas (identidade, distância). A identidade pode
+                ser o nome da pessoa ou o id de um rastreador.
+            timestamp (float): Momento do frame (padrão: time.time())
+
+        Returns:
+            list: Eventos gerados, dicionários com timestamp, seen_at, type,
+            identity e distance
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self._last_timestamp = timestamp
+
+        # Expirar antes de contar: acertos separados por mais de leave_after não se somam
+        events = self.expire(timestamp)
+
+        # Mais de um rosto com a mesma identidade no frame conta uma vez
+        seen = {}
+        for identity, distance in detections:
+            if identity in self.ignore:
+                continue
+            best = seen.get(identity)
+            if best is None or (distance is not None and distance < best):
+                seen[identity] = distance
+
+        for identity, distance in seen.items():
+            track = self._tracks.get(identity)
+            if track is None:
+                track = self._tracks[identity] = [timestamp, timestamp, 0, distance, False]
+            track[1] = timestamp
+            track[2] += 1
+            if distance is not None and (track[3] is None or distance < track[3]):
+                track[3] = distance
+            if not track[4] and track[2] >= self.min_hits:
+                track[4] = True
+                events.append(self._event(timestamp, track[0], 'enter', identity, track[3]))
+
+        return events
+
+    def expire(self, timestamp=None):
+        """
+        Gera as saídas das identidades que não aparecem há leave_after segundos.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        for identity, track in list(self._tracks.items()):
+            if timestamp - track[1] >= self.leave_after:
+                del self._tracks[identity]
+                if track[4]:
+                    events.append(self._event(timestamp, track[1], 'leave', identity, track[3]))
+        return events
+
+    def close(self):
+        """
+        Gera a saída de todas as identidades ainda presentes.
+        """
+        timestamp = time.time() if self._last_timestamp is None else self._last_timestamp
+        events = [self._event(timestamp, track[1], 'leave', identity, track[3])
+                  for identity, track in self._tracks.items() if track[4]]
+        self._tracks.clear()
+        return events
+
+    @staticmethod
+    def _event(timestamp, seen_at, event_type, identity, distance):
+        return {'timestamp': timestamp, 'seen_at': seen_at, 'type': event_type,
+                'identity': identity, 'distance': distance}
+
+
+class EventWriter:
+    def __init__(self, path, fmt=None, fsync_interval=1.0, index_every=256,
+                 buffer_size=64 * 1024):
+        """
+        Grava eventos em um arquivo somente de acréscimo, com índice por tempo.
+
+        O índice fica em '<path>.idx' e guarda a posição de um a cada
+        index_every registros, permitindo consultas por intervalo sem ler o
+        arquivo inteiro.
+
+        Args:
+            path (str): Arquivo de eventos
+            fmt (str): 'jsonl' ou 'bin' (padrão: pela extensão, '.bin' é binário)
+            fsync_interval (float): Segundos entre sincronizações com o disco
+            index_every (int): Registros entre entradas do índice
+            buffer_size (int): Tamanho do buffer de escrita em bytes
+        """
+        self.path = path
+        self.fmt = _detect_format(path, fmt)
+        self.fsync_interval = fsync_interval
+        self.index_every = index_every
+
+        # Descartar o registro incompleto deixado por uma gravação interrompida
+        _recover(path, self.fmt)
+
+        self._file = open(path, 'ab', buffering=buffer_size)
+        self._index = open(path + '.idx', 'ab')
+        self._since_index = 0
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, event):
+        """
+        Acrescenta um evento ao arquivo.
+
+        Args:
+            event (dict): Evento com timestamp, seen_at, type, identity e distance
+        """
+        if self._since_index == 0:
+            self._index.write(_INDEX_ENTRY.pack(event['timestamp'], self._file.tell()))
+        self._since_index = (self._since_index + 1) % self.index_every
+
+        self._file.write(self._encode(event))
+        self._dirty = True
+        self.poll()
+
+    def poll(self):
+        """
+        Sincroniza com o disco se houver dados pendentes há fsync_interval segundos.
+        """
+        if self._dirty and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self.sync()
+
+    def _encode(self, event):
+        if self.fmt == 'jsonl':
+            return (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+
+        name = str(event['identity']).encode('utf-8')
+        distance = math.nan if event['distance'] is None else event['distance']
+        seen_at = event.get('seen_at', event['timestamp'])
+        return _RECORD.pack(event['timestamp'], seen_at, EVENT_TYPES.index(event['type']),
+                            distance, len(name)) + name
+
+    def sync(self):
+        """
+        Esvazia os buffers e força a gravação no disco.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._index.flush()
+        os.fsync(self._index.fileno())
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def close(self):
+        """
+        Sincroniza e fecha os arquivos.
+        """
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+        self._index.close()
+
+
+class RecognitionEventLog:
+    def __init__(self, path, fmt=None, leave_after=2.0, min_hits=2, fsync_interval=1.0):
+        """
+        Registra as entradas e saídas das pessoas reconhecidas.
+
+        Args:
+            path (str): Arquivo de eventos ('.jsonl' ou '.bin')
+            fmt (str): Força o formato ('jsonl' ou 'bin')
+            leave_after (float): Segundos sem ver a pessoa para registrar a saída
+            min_hits (int): Frames processados com a pessoa antes da entrada
+            fsync_interval (float): Segundos entre sincronizações com o disco
+        """
+        self.debouncer = EventDebouncer(leave_after=leave_after, min_hits=min_hits)
+        self.writer = EventWriter(path, fmt=fmt, fsync_interval=fsync_interval)
+        self.events = 0
+
+    def record(self, detections, timestamp=None):
+        """
+        Processa as detecções de um frame e grava os eventos gerados.
+
+        Args:
+            detections (list): Tuplas (identidade, distância)
+            timestamp (float): Momento do frame (padrão: time.time())
+
+        Returns:
+            list: Eventos gravados
+        """
+        events = self.debouncer.update(detections, timestamp)
+        for event in events:
+            self.writer.write(event)
+        self.events += len(events)
+
+        # Garantir o fsync periódico mesmo em frames sem eventos
+        self.writer.poll()
+        return events
+
+    def close(self):
+        """
+        Registra a saída de quem ainda está presente e fecha o arquivo.
+        """
+        for event in self.debouncer.close():
+            self.writer.write(event)
+            self.events += 1
+        self.writer.close()
+
+
+def _read_records(f, fmt):
+    if fmt == 'jsonl':
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Linha corrompida ou incompleta: ignorar e seguir para a próxima
+                continue
+        return
+
+    while True:
+        header = f.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return
+        timestamp, seen_at, event_type, distance, size = _RECORD.unpack(header)
+        name = f.read(size)
+        if len(name) < size or event_type >= len(EVENT_TYPES):
+            return
+        yield {'timestamp': timestamp, 'seen_at': seen_at, 'type': EVENT_TYPES[event_type],
+               'identity': name.decode('utf-8'),
+               'distance': None if math.isnan(distance) else distance}
+
+
+def _complete_length(f, fmt):
+    """
+    Retorna quantos bytes, a partir da posição atual, formam registros completos.
+    """
+    if fmt == 'jsonl':
+        data = f.read()
+        return data.rfind(b'\n') + 1
+
+    length = 0
+    while True:
+        header = f.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return length
+        _, _, event_type, _, size = _RECORD.unpack(header)
+        if event_type >= len(EVENT_TYPES) or len(f.read(size)) < size:
+            return length
+        length += _RECORD.size + size
+
+
+def _recover(path, fmt):
+    """
+    Trunca o arquivo de eventos e o índice no último registro completo.
+
+    Uma gravação interrompida (queda de energia, processo encerrado) pode
+    deixar um registro pela metade no fim do arquivo; sem esta limpeza, os
+    eventos acrescentados depois dele ficariam ilegíveis.
+    """
+    if not os.path.exists(path):
+        if os.path.exists(path + '.idx'):
+            os.remove(path + '.idx')
+        return
+
+    timestamps, offsets = _load_index(path)
+    with open(path, 'r+b') as f:
+        size = os.fstat(f.fileno()).st_size
+
+        # Verificar a partir da última entrada do índice que aponta para dentro do arquivo
+        start = max([offset for offset in offsets if offset < size], default=0)
+        f.seek(start)
+        end = start + _complete_length(f, fmt)
+        if end < size:
+            f.truncate(end)
+
+    valid = [(ts, offset) for ts, offset in zip(timestamps, offsets) if offset < end]
+    index_size = os.path.getsize(path + '.idx') if os.path.exists(path + '.idx') else 0
+    if index_size != len(valid) * _INDEX_ENTRY.size:
+        with open(path + '.idx', 'wb') as f:
+            for ts, offset in valid:
+                f.write(_INDEX_ENTRY.pack(ts, offset))
+
+
+def _load_index(path):
+    try:
+        with open(path + '.idx', 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], []
+    count = len(data) // _INDEX_ENTRY.size
+    entries = [_INDEX_ENTRY.unpack_from(data, i * _INDEX_ENTRY.size) for i in range(count)]
+    return [ts for ts, _ in entries], [offset for _, offset in entries]
+
+
+def read_events(path, start=None, end=None, fmt=None):
+    """
+    Lê os eventos gravados no intervalo de tempo [start, end].
+
+    Usa o índice para pular direto para o trecho do arquivo que contém start.
+
+    Args:
+        path (str): Arquivo de eventos
+        start (float): Timestamp inicial (padrão: início do arquivo)
+        end (float): Timestamp final (padrão: fim do arquivo)
+        fmt (str): 'jsonl' ou 'bin' (padrão: pela extensão)
+
+    Returns:
+        list: Eventos no intervalo, na ordem em que foram gravados
+    """
+    fmt = _detect_format(path, fmt)
+    timestamps, offsets = _load_index(path)
+
+    offset = 0
+    if start is not None and timestamps:
+        # Os eventos são gravados em ordem cronológica: começar pela última
+        # entrada do índice anterior a start
+        position = bisect.bisect_left(timestamps, start) - 1
+        offset = offsets[position] if position >= 0 else 0
+
+    events = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for event in _read_records(f, fmt):
+            if start is not None and event['timestamp'] < start:
+                continue
+            if end is not None and event['timestamp'] > end:
+                break
+            events.append(event)
+    return events
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    """
+    Consulta os eventos de reconhecimento gravados em um intervalo de tempo.
+    """
+    parser = argparse.ArgumentParser(description='Consulta de eventos de reconhecimento')
+    parser.add_argument('arquivo', help='Arquivo de eventos (.jsonl ou .bin)')
+    parser.add_argument('--inicio', help='Início do intervalo (ISO 8601 ou timestamp)')
+    parser.add_argument('--fim', help='Fim do intervalo (ISO 8601 ou timestamp)')
+
+    args = parser.parse_args()
+
+    start = _parse_time(args.inicio) if args.inicio else None
+    end = _parse_time(args.fim) if args.fim else None
+
+    # O intervalo é aplicado ao timestamp (momento da decisão); seen_at é a
+    # primeira (entrada) ou a última (saída) vez em que o rosto foi visto
+    print(f"{'Registrado em':<19}  {'Visto em':<19}  {'Evento':<8} Identidade")
+    for event in read_events(args.arquivo, start, end):
+        recorded = datetime.fromtimestamp(event['timestamp']).isoformat(sep=' ', timespec='seconds')
+        seen_at = event.get('seen_at', event['timestamp'])
+        seen = datetime.fromtimestamp(seen_at).isoformat(sep=' ', timespec='seconds')
+        label = "Entrada" if event['type'] == 'enter' else "Saída"
+        print(f"{recorded}  {seen}  {label:<8} {event['identity']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Estado de cada processo trabalhador: visão da galeria em memória compartilhada
+_shm = None
+_gallery = None
+_norms = None
+
+
+def _attach_gallery(shm_name, shape, dtype):
+    """
+    Inicializador dos trabalhadores: acessa a galeria sem copiá-la.
+    """
+    global _shm, _gallery, _norms
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _gallery, _norms = _gallery_views(_shm.buf, shape, dtype)
+
+
+def _gallery_views(buffer, shape, dtype):
+    """
+    Divide o bloco de memória em matriz de encodings e vetor de normas ao quadrado.
+    """
+    count, dim = shape
+    gallery = np.ndarray((count, dim), dtype=dtype, buffer=buffer)
+    norms = np.ndarray((count,), dtype=dtype, buffer=buffer,
+                       offset=count * dim * np.dtype(dtype).itemsize)
+    return gallery, norms
+
+
+def _search_range(gallery, norms, start, end, probes, k, chunk_size):
+    """
+    Busca os k encodings mais próximos de cada probe no intervalo [start, end).
+
+    Returns:
+        tuple: (distâncias, índices globais), ambos com formato (probes, k)
+    """
+    probe_norms = np.einsum('ij,ij->i', probes, probes)[:, None]
+    best_dist = np.full((len(probes), 0), np.inf, dtype=probes.dtype)
+    best_idx = np.empty((len(probes), 0), dtype=np.int64)
+
+    # Percorrer o shard em blocos para limitar a memória da matriz de distâncias
+    for chunk_start in range(start, end, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, end)
+        chunk = gallery[chunk_start:chunk_end]
+
+        # ||a - b||² = ||a||² + ||b||² - 2·a·b
+        dist = probe_norms + norms[chunk_start:chunk_end] - 2 * probes @ chunk.T
+        idx = np.broadcast_to(np.arange(chunk_start, chunk_end), dist.shape)
+
+        best_dist = np.concatenate([best_dist, dist], axis=1)
+        best_idx = np.concatenate([best_idx, idx], axis=1)
+        best_dist, best_idx = _top_k(best_dist, best_idx, k)
+
+    return np.sqrt(np.maximum(best_dist, 0)), best_idx
+
+
+def _search_shard(task):
+    start, end, probes, k, chunk_size = task
+    return _search_range(_gallery, _norms, start, end, probes, k, chunk_size)
+
+
+def _top_k(distances, indices, k):
+    """
+    Mantém, para cada linha, os k menores valores em ordem crescente.
+    """
+    if distances.shape[1] > k:
+        part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, part, axis=1)
+        indices = np.take_along_axis(indices, part, axis=1)
+    order = np.argsort(distances, axis=1)
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+class ShardedGallery:
+    def __init__(self, encodings, num_shards=1, dtype=np.float64, chunk_size=65536):
+        """
+        Galeria de encodings dividida em shards processados em paralelo.
+
+        A galeria é copiada uma única vez para memória compartilhada; cada
+        processo trabalhador acessa o mesmo bloco e varre apenas o seu
+        intervalo. Com num_shards=1 a busca roda no próprio processo.
+
+        Args:
+            encodings (list): Encodings conhecidos (vetores de 128 posições)
+            num_shards (int): Quantidade de shards/processos trabalhadores
+            dtype: Tipo numérico da galeria. O padrão float64 mantém as distâncias
+                do face_recognition.face_distance; float32 reduz pela metade a
+                memória e a banda, com diferenças mínimas perto da tolerância
+            chunk_size (int): Linhas do shard processadas por vez
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards deve ser maior que zero")
+
+        encodings = np.asarray(encodings, dtype=dtype)
+        if encodings.ndim != 2:
+            encodings = encodings.reshape(len(encodings), -1 if len(encodings) else 128)
+
+        self.dtype = np.dtype(dtype)
+        self.shape = encodings.shape
+        self.chunk_size = chunk_size
+        self.num_shards = max(1, min(num_shards, len(encodings)))
+        self._shm = None
+        self._pool = None
+
+        count = len(encodings)
+        bounds = np.linspace(0, count, self.num_shards + 1).astype(int)
+        self.shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        if self.num_shards == 1:
+            self._gallery = encodings
+            self._norms = np.einsum('ij,ij->i', encodings, encodings)
+            return
+
+        # Galeria + normas em um único bloco de memória compartilhada
+        size = max(1, count * (self.shape[1] + 1) * self.dtype.itemsize)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._gallery, self._norms = _gallery_views(self._shm.buf, self.shape, self.dtype)
+        self._gallery[:] = encodings
+        self._norms[:] = np.einsum('ij,ij->i', encodings, encodings)
+
+        self._pool = mp.Pool(self.num_shards, initializer=_attach_gallery,
+                             initargs=(self._shm.name, self.shape, self.dtype))
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def shared_bytes(self):
+        """
+        Tamanho do bloco de memória compartilhada (0 quando num_shards=1).
+        """
+        return self._shm.size if self._shm is not None else 0
+
+    def worker_pids(self):
+        """
+        Retorna os PIDs dos processos trabalhadores ativos (vazio quando num_shards=1).
+        """
+        if self._pool is None:
+            return []
+        return [process.pid for process in self._pool._pool]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def search(self, probes, k=1):
+        """
+        Busca os k encodings mais próximos de cada probe em todos os shards.
+
+        Args:
+            probes (list): Encodings a comparar com a galeria
+            k (int): Quantidade de vizinhos por probe
+
+        Returns:
+            tuple: (distâncias, índices), arrays (len(probes), k) ordenados da
+            menor para a maior distância. Se a galeria tiver menos de k
+            entradas, as colunas retornadas são limitadas ao tamanho dela.
+        """
+        probes = np.asarray(probes, dtype=self.dtype).reshape(-1, self.shape[1])
+        k = min(k, len(self))
+        if len(probes) == 0 or k == 0:
+            return (np.empty((len(probes), 0), dtype=self.dtype),
+                    np.empty((len(probes), 0), dtype=np.int64))
+
+        if self._pool is None:
+            return _search_range(self._gallery, self._norms, 0, len(self),
+                                 probes, k, self.chunk_size)
+
+        # Enviar o lote de probes a todos os shards e unir os top-k parciais
+        tasks = [(start, end, probes, k, self.chunk_size) for start, end in self.shards]
+        partial = self._pool.map(_search_shard, tasks)
+        distances = np.concatenate([d for d, _ in partial], axis=1)
+        indices = np.concatenate([i for _, i in partial], axis=1)
+        return _top_k(distances, indices, k)
+
+    def close(self):
+        """
+        Encerra os trabalhadores e libera a memória compartilhada.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._shm is not None:
+            self._gallery = self._norms = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def main():
+    """
+    Compara a busca distribuída com a busca exaustiva em uma galeria aleatória.
+    """
+    parser = argparse.ArgumentParser(description='Teste da galeria distribuída')
+    parser.add_argument('--tamanho', type=int, default=100000,
+                       help='Quantidade de encodings na galeria (padrão: 100000)')
+    parser.add_argument('--shards', type=int, default=4,
+                       help='Quantidade de shards/processos (padrão: 4)')
+    parser.add_argument('--probes', type=int, default=32,
+                       help='Encodings por lote de busca (padrão: 32)')
+    parser.add_argument('--k', type=int, default=5,
+                       help='Vizinhos retornados por probe (padrão: 5)')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    encodings = rng.normal(0, 0.1, (args.tamanho, 128)).astype(np.float32)
+    probes = encodings[rng.integers(0, args.tamanho, args.probes)] + \
+        rng.normal(0, 0.01, (args.probes, 128)).astype(np.float32)
+
+    with ShardedGallery(encodings, num_shards=args.shards) as gallery:
+        start = time.perf_counter()
+        distances, indices = gallery.search(probes, k=args.k)
+        elapsed = time.perf_counter() - start
+
+    # Busca exaustiva de referência, um probe por vez
+    expected = np.array([np.argmin(np.linalg.norm(encodings - probe, axis=1)) for probe in probes])
+    status = "✓" if np.array_equal(indices[:, 0], expected) else "✗"
+    print(f"{status} {args.probes} probes x {args.tamanho} encodings em "
+          f"{gallery.num_shards} shards: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
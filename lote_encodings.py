@@ -0,0 +1,276 @@
+import time
+
+import dlib
+import numpy as np
+from face_recognition import api as fr_api
+
+
+def align_faces(image, face_locations, size=150, padding=0.25):
+    """
+    Recorta e alinha os rostos de uma imagem no formato esperado pelo encoder.
+
+    Usa os mesmos parâmetros que face_recognition.face_encodings aplica
+    internamente (landmarks de 5 pontos, recorte 150x150 com padding 0.25),
+    de modo que os encodings gerados em lote sejam equivalentes.
+
+    Args:
+        image (numpy.ndarray): Imagem RGB
+        face_locations (list): Localizações (top, right, bottom, left) dos rostos
+        size (int): Tamanho do recorte em pixels
+        padding (float): Margem adicionada ao redor do rosto
+
+    Returns:
+        list: Lista de recortes alinhados (numpy.ndarray), um por rosto
+    """
+    if not face_locations:
+        return []
+
+    landmarks = fr_api._raw_face_landmarks(image, face_locations, model="small")
+    shapes = dlib.full_object_detections()
+    for shape in landmarks:
+        shapes.append(shape)
+
+    return list(dlib.get_face_chips(image, shapes, size=size, padding=padding))
+
+
+class BatchEncodingError(Exception):
+    def __init__(self, lost, cause):
+        """
+        Falha do encoder ao processar um lote.
+
+        Args:
+            lost (list): Tuplas (source_id, location) dos rostos sem encoding
+            cause (Exception): Erro original do encoder
+        """
+        super().__init__(f"{len(lost)} rosto(s) sem encoding: {cause}")
+        self.lost = lost
+        self.cause = cause
+
+
+class EncodingBatcher:
+    def __init__(self, batch_size=32, max_wait=0.05, num_jitters=1, encoder=None):
+        """
+        Agrupa rostos de várias fontes (frames, streams, imagens) em lotes de
+        tamanho fixo antes de chamar o encoder.
+
+        Args:
+            batch_size (int): Quantidade de rostos por chamada ao encoder
+            max_wait (float): Tempo máximo, em segundos, que um rosto pode
+                esperar na fila antes de o lote ser enviado incompleto
+            num_jitters (int): Reamostragens por rosto (igual a face_encodings)
+            encoder (callable): Função que recebe uma lista de recortes
+                alinhados e devolve um encoding por recorte. Por padrão usa o
+                modelo do face_recognition.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser maior que zero")
+
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.num_jitters = num_jitters
+        self.encoder = encoder or self._default_encoder
+
+        # Fila de rostos pendentes: (source_id, location, recorte)
+        self._pending = []
+        self._oldest = None
+
+        # Resultados já gerados que ainda não foram entregues à sua fonte
+        self._ready = []
+
+        # Lotes em que o encoder falhou (BatchEncodingError), até take_errors()
+        self._errors = []
+
+        # Estatísticas acumuladas
+        self.batches = 0
+        self.faces = 0
+        self.failed = 0
+        self.align_time = 0.0
+        self.encode_time = 0.0
+
+    def _default_encoder(self, chips):
+        descriptors = fr_api.face_encoder.compute_face_descriptor(chips, self.num_jitters)
+        return [np.array(d) for d in descriptors]
+
+    def submit(self, source_id, image, face_locations):
+        """
+        Adiciona os rostos de uma imagem à fila.
+
+        Args:
+            source_id: Identificador livre da origem (stream, frame, arquivo)
+            image (numpy.ndarray): Imagem RGB
+            face_locations (list): Localizações dos rostos na imagem
+
+        Returns:
+            list: Resultados (source_id, location, encoding) dos lotes que
+            ficaram completos com esta submissão
+        """
+        start = time.perf_counter()
+        chips = align_faces(image, face_locations)
+        self.align_time += time.perf_counter() - start
+
+        if chips and self._oldest is None:
+            self._oldest = time.monotonic()
+
+        for location, chip in zip(face_locations, chips):
+            self._pending.append((source_id, location, chip))
+
+        results = self._take_ready()
+        while len(self._pending) >= self.batch_size:
+            results.extend(self._encode(self.batch_size))
+        return results
+
+    def poll(self):
+        """
+        Envia o lote incompleto se o rosto mais antigo já esperou max_wait.
+
+        Returns:
+            list: Resultados (source_id, location, encoding), possivelmente vazia
+        """
+        if self._oldest is not None and time.monotonic() - self._oldest >= self.max_wait:
+            return self.flush()
+        return self._take_ready()
+
+    def flush(self):
+        """
+        Envia todos os rostos pendentes, mesmo que o lote não esteja completo.
+
+        Returns:
+            list: Resultados (source_id, location, encoding)
+        """
+        results = self._take_ready()
+        while self._pending:
+            results.extend(self._encode(min(self.batch_size, len(self._pending))))
+        return results
+
+    def encode(self, image, face_locations):
+        """
+        Gera os encodings de uma única imagem imediatamente.
+
+        Equivalente a face_recognition.face_encodings(image, face_locations),
+        mas passando pelo mesmo caminho em lote e contabilizando estatísticas.
+        Rostos já pendentes de outras fontes seguem no mesmo lote; os
+        resultados deles ficam guardados e são devolvidos pela próxima
+        chamada de submit, poll ou flush.
+
+        Returns:
+            list: Encodings na mesma ordem de face_locations
+
+        Raises:
+            BatchEncodingError: Se o encoder falhar em algum rosto desta imagem
+        """
+        marker = object()
+        results = self.submit(marker, image, face_locations)
+        results.extend(self.flush())
+
+        encodings = []
+        for result in results:
+            if result[0] is marker:
+                encodings.append(result[2])
+            else:
+                self._ready.append(result)
+
+        # Falhas de outras fontes continuam disponíveis em take_errors()
+        own_lost = []
+        errors = []
+        for error in self.take_errors():
+            own = [lost for lost in error.lost if lost[0] is marker]
+            others = [lost for lost in error.lost if lost[0] is not marker]
+            own_lost.extend(own)
+            if others:
+                errors.append(BatchEncodingError(others, error.cause))
+            if own:
+                cause = error.cause
+        self._errors.extend(errors)
+
+        if own_lost:
+            raise BatchEncodingError(own_lost, cause)
+        return encodings
+
+    def take_errors(self):
+        """
+        Retorna e limpa as falhas do encoder desde a última chamada.
+
+        Returns:
+            list: BatchEncodingError, um por lote que falhou
+        """
+        errors, self._errors = self._errors, []
+        return errors
+
+    def _take_ready(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def _encode(self, count):
+        batch = self._pending[:count]
+        del self._pending[:count]
+        self._oldest = time.monotonic() if self._pending else None
+
+        start = time.perf_counter()
+        try:
+            encodings = self.encoder([chip for _, _, chip in batch])
+        except Exception as e:
+            # Refazer rosto a rosto para perder apenas os que falham sozinhos
+            results, lost = self._encode_one_by_one(batch)
+            if lost:
+                self._errors.append(BatchEncodingError(lost, e))
+            return results
+        finally:
+            self.encode_time += time.perf_counter() - start
+
+        self.batches += 1
+        self.faces += len(batch)
+
+        return [(source_id, location, encoding)
+                for (source_id, location, _), encoding in zip(batch, encodings)]
+
+    def _encode_one_by_one(self, batch):
+        """
+        Gera os encodings de um lote que falhou chamando o encoder por rosto.
+
+        Returns:
+            tuple: (resultados dos rostos que deram certo, (source_id, location)
+            dos que falharam)
+        """
+        results = []
+        lost = []
+        for source_id, location, chip in batch:
+            try:
+                encoding = self.encoder([chip])[0]
+            except Exception:
+                lost.append((source_id, location))
+                continue
+            self.batches += 1
+            self.faces += 1
+            results.append((source_id, location, encoding))
+        self.failed += len(lost)
+        return results, lost
+
+    def stats(self):
+        """
+        Retorna métricas de uso do lote.
+
+        Returns:
+            dict: batches, faces, failed (rostos perdidos por falha do
+            encoder), fill_rate (fração média de ocupação dos lotes) e custo por rosto em milissegundos (alinhamento e encoder)
+        """
+        fill_rate = self.faces / (self.batches * self.batch_size) if self.batches else 0.0
+        faces = self.faces or 1
+        return {
+            'batches': self.batches,
+            'faces': self.faces,
+            'failed': self.failed,
+            'fill_rate': fill_rate,
+            'align_ms_per_face': 1000 * self.align_time / faces,
+            'encode_ms_per_face': 1000 * self.encode_time / faces,
+        }
+
+    def format_stats(self):
+        """
+        Retorna as métricas em uma linha legível.
+        """
+        s = self.stats()
+        failed = f" | Falhas: {s['failed']}" if s['failed'] else ""
+        return (f"Lotes: {s['batches']} | Rostos: {s['faces']}{failed} | "
+                f"Preenchimento: {s['fill_rate']:.0%} | "
+                f"Custo por rosto: {s['align_ms_per_face'] + s['encode_ms_per_face']:.2f} ms "
+                f"(alinhamento {s['align_ms_per_face']:.2f} ms, encoder {s['encode_ms_per_face']:.2f} ms)")